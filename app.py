@@ -1,31 +1,56 @@
-from flask import Flask, request, jsonify, send_from_directory, url_for, redirect
-from moviepy.editor import (
-    ImageClip, concatenate_videoclips, AudioFileClip, CompositeAudioClip,
-    TextClip, CompositeVideoClip
-)
 import os
+# Read before .env is loaded (python-dotenv would import threading first), so
+# GEVENT must be set in the real environment, as gunicorn.conf.py also expects
+GEVENT = os.getenv('GEVENT') == '1'
+if GEVENT:
+    # Must run before anything imports socket, ssl or threading
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, Response, request, jsonify, send_from_directory, url_for, redirect, g
 import random
+import re
+import glob
 import shutil
+import subprocess
+import tempfile
 import uuid
 import logging
+import atexit
+import queue
+from logging.handlers import QueueHandler, QueueListener
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import jwt
-import mysql.connector
+from mysql.connector import errors as mysql_errors, pooling
 import hashlib
 import hmac
+import html
 import json
-from werkzeug.utils import secure_filename
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask_cors import CORS
+from cachetools import TLRUCache, TTLCache
 from dotenv import load_dotenv
-from werkzeug.security import generate_password_hash
+from ulid import ULID
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 import smtplib
 from email.message import EmailMessage
+try:
+    import fcntl
+except ImportError:  # Windows: renders are then only limited per process
+    fcntl = None
 
 
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
 
 # Load environment variables
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '.env'))
@@ -34,29 +59,127 @@ load_dotenv(dotenv_path=env_path)
 # Configuration from environment variables
 frontend_url = os.getenv('NEXT_PUBLIC_API_URL')
 RESET_TOKEN_EXPIRY_HOURS = int(os.getenv('RESET_TOKEN_EXPIRY_HOURS', 1))
+# Argon2id parameters; raising them rehashes each account on its next sign in
+password_hasher = PasswordHasher(time_cost=2, memory_cost=65536, parallelism=1)
+_JWT_DECODE_OPTS = {'algorithms': ['HS256'], 'options': {'verify_aud': False}}
+MAX_TOKEN_LENGTH = 1024  # Tokens we issue are well under this
 MAX_VIDEOS_PER_USER = int(os.getenv('MAX_VIDEOS_PER_USER', 10))  # Maximum number of videos a user can have
+# CORS_ALLOWED_ORIGINS: comma-separated frontend origins allowed to call the API,
+# e.g. https://app.example.com,https://www.example.com. Unset means no cross-origin
+# access at all; set it to * only if the API really is meant to be public.
+CORS_ALLOWED_ORIGINS = [o.strip() for o in os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if o.strip()]
+
+# Browsers cache the preflight for a day instead of sending OPTIONS before every call
+CORS(
+    app,
+    resources={r"/*": {"origins": CORS_ALLOWED_ORIGINS}},
+    methods=['GET', 'POST', 'DELETE', 'OPTIONS'],
+    allow_headers=['Content-Type', 'Authorization'],
+    max_age=86400
+)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging. Records are queued and written by a listener thread so
+# request threads never block on log I/O.
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper(), handlers=[QueueHandler(_log_queue)])
 logger = logging.getLogger(__name__)
 app.logger.handlers.clear()
-app.logger.addHandler(logging.StreamHandler())
+if not CORS_ALLOWED_ORIGINS:
+    logger.warning("CORS_ALLOWED_ORIGINS is not set; browsers on other origins cannot call this API")
 
 # App configuration
 app.config['SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
 app.config['JWT_EXPIRATION'] = int(os.getenv('JWT_EXPIRATION', 86400))
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 33554432))  # 32MB max upload size
+# Let Apache (mod_xsendfile) stream files that send_from_directory returns
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'False').lower() == 'true'
+# SMTP settings for account emails
+SMTP_HOST = os.getenv('SMTP_HOST')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
+SMTP_USER = os.getenv('SMTP_USER')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+SMTP_FROM = os.getenv('SMTP_FROM')
+EMAIL_WORKERS = int(os.getenv('EMAIL_WORKERS', 4))  # Concurrent SMTP sends per process
+SMTP_IDLE_TIMEOUT = int(os.getenv('SMTP_IDLE_TIMEOUT', 240))  # Reconnect instead of reusing a connection idle this long
+
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 30))  # Seconds a validated token's user row is reused
+SESSION_REFRESH_GRACE = int(os.getenv('SESSION_REFRESH_GRACE', 300))  # Seconds after expiry /session still renews a token
 
 # Cashfree configuration
 CASHFREE_APP_ID = os.getenv('CASHFREE_APP_ID')
 CASHFREE_SECRET_KEY = os.getenv('CASHFREE_SECRET_KEY')
 CASHFREE_BASE_URL = os.getenv('CASHFREE_BASE_URL')
+CASHFREE_TIMEOUT = (3, 10)  # (connect, read) seconds
+
+# Shared session keeps connections to Cashfree alive across requests. Only
+# the order status GETs are retried: POST /orders is left out of allowed_methods
+# so a retry can't create a second order. raise_on_status=False hands the last
+# 5xx response back to the caller instead of raising RetryError.
+cashfree_session = requests.Session()
+cashfree_session.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({'GET'}),
+        raise_on_status=False
+    )
+))
+cashfree_session.headers.update({
+    "x-client-id": CASHFREE_APP_ID,
+    "x-client-secret": CASHFREE_SECRET_KEY,
+    "x-api-version": "2022-09-01"
+})
 
 # Define paths for media
-IMAGE_FOLDER = os.getenv('IMAGE_FOLDER', 'media/images')
-VOICE_FOLDER = os.getenv('VOICE_FOLDER', 'media/voice')
-BACKGROUND_FOLDER = os.getenv('BACKGROUND_FOLDER', 'media/background')
+RENDER_TMP_FOLDER = os.getenv('RENDER_TMP_FOLDER')  # Parent of per-job work dirs; system temp dir if unset
 OUTPUT_BASE_FOLDER = os.getenv('OUTPUT_BASE_FOLDER', 'new_output')
+# nginx internal location mapped onto OUTPUT_BASE_FOLDER, e.g.
+#   location /_internal_videos/ { internal; alias /app/new_output/; }
+# When set, serve_video answers with X-Accel-Redirect and nginx streams the file
+VIDEO_ACCEL_REDIRECT_PREFIX = os.getenv('VIDEO_ACCEL_REDIRECT_PREFIX')
+
+# Video rendering configuration
+FFMPEG_BIN = os.getenv('FFMPEG_BIN', 'ffmpeg')
+FFPROBE_BIN = os.getenv('FFPROBE_BIN', 'ffprobe')
+FFMPEG_FONTFILE = os.getenv('FFMPEG_FONTFILE')  # Optional font for text overlays
+VIDEO_WIDTH = int(os.getenv('VIDEO_WIDTH', 1280))
+VIDEO_HEIGHT = int(os.getenv('VIDEO_HEIGHT', 720))
+VIDEO_FPS = 24
+VIDEO_ENCODER = os.getenv('VIDEO_ENCODER')  # Force an encoder instead of auto-detecting
+
+# Encoder-specific output options. Hardware encoders are tried in this order
+# and libx264 is the fallback.
+VIDEO_ENCODER_ARGS = {
+    'h264_nvenc': ['-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-pix_fmt', 'yuv420p'],
+    'h264_qsv': ['-preset', 'veryfast', '-global_quality', '23', '-pix_fmt', 'nv12'],
+    'libx264': ['-preset', 'veryfast', '-threads', '4', '-pix_fmt', 'yuv420p'],
+}
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', 2))  # Render jobs each process takes on at once
+# Renders running at once across every worker process on this host; libx264 uses 4 threads each
+RENDER_CONCURRENCY = int(os.getenv('RENDER_CONCURRENCY', max(1, (os.cpu_count() or 4) // 4)))
+RENDER_LOCK_FOLDER = os.getenv('RENDER_LOCK_FOLDER', os.path.join(tempfile.gettempdir(), 'genvideo_render_slots'))
+# Pending videos whose process stopped heartbeating this long ago are marked failed
+RENDER_STALE_AFTER = int(os.getenv('RENDER_STALE_AFTER', 300))
+RENDER_HEARTBEAT_INTERVAL = 60
+ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif'}
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 10485760))  # 10MB per image
+IMAGE_SAVE_WORKERS = 8
+UPLOAD_COPY_BUFFER = 1024 * 1024
+
+# Output filenames carry the owner's id, e.g. video_u42_20250101_120000_1234.mp4
+VIDEO_FILENAME_PATTERN = re.compile(r'video_u(\d+)_\d{8}_\d{6}_\d{4}\.mp4')
+
+# Maps the transitionType form values to ffmpeg xfade transitions
+XFADE_TRANSITIONS = {
+    "fade": "fade",
+    "slide": "slideleft"
+}
 
 # Database configuration
 DATABASE_CONFIG = {
@@ -64,42 +187,197 @@ DATABASE_CONFIG = {
     "user": os.getenv('DB_USER'),
     "password": os.getenv('DB_PASSWORD'),
     "database": os.getenv('DB_NAME'),
-    "auth_plugin": os.getenv('DB_AUTH_PLUGIN')
+    "auth_plugin": os.getenv('DB_AUTH_PLUGIN'),
+    # Sessions run in UTC so CURRENT_TIMESTAMP matches the app's UTC datetimes
+    "time_zone": "+00:00",
+    # gevent can only make the pure-Python driver's sockets cooperative
+    "use_pure": GEVENT
 }
+# MySQLConnectionPool opens every connection up front, so size it to what one
+# process can use at once: its request threads, render threads and the render
+# watchdog. gunicorn.conf.py warns when workers x DB_POOL_SIZE exceeds
+# DB_MAX_CONNECTIONS.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', int(os.getenv('GUNICORN_THREADS', 8)) + RENDER_WORKERS + 1))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # Seconds to wait for a free pooled connection
 
 # Ensure all required folders exist
-for folder in [IMAGE_FOLDER, VOICE_FOLDER, BACKGROUND_FOLDER, OUTPUT_BASE_FOLDER]:
-    os.makedirs(folder, exist_ok=True)
+for folder in [RENDER_TMP_FOLDER, OUTPUT_BASE_FOLDER, fcntl and RENDER_LOCK_FOLDER]:
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+# Videos are rendered off the request thread; progress is tracked in videos.status
+render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix='render')
+# Emails are sent off the request thread so signup and forgot-password don't wait on SMTP
+email_executor = ThreadPoolExecutor(max_workers=EMAIL_WORKERS, thread_name_prefix='email')
 
 # Helper functions
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Create the connection pool on first use so each worker process gets its own"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = pooling.MySQLConnectionPool(
+                    pool_name='gv',
+                    pool_size=DB_POOL_SIZE,
+                    autocommit=True,
+                    **DATABASE_CONFIG
+                )
+    return _db_pool
+
 def get_db_connection():
+    # close() on a pooled connection hands it back to the pool. The connector
+    # raises PoolError as soon as the pool is exhausted, so wait for a
+    # connection to be returned instead of failing the request.
+    deadline = time.monotonic() + DB_POOL_TIMEOUT
+    while True:
+        try:
+            return get_db_pool().get_connection()
+        except mysql_errors.PoolError:
+            if time.monotonic() >= deadline:
+                logger.error(f"No pooled database connection free after {DB_POOL_TIMEOUT}s")
+                return None
+            time.sleep(0.01)
+        except Exception as e:
+            logger.error(f"Database connection error: {e}")
+            return None
+
+@contextmanager
+def db_cursor(dictionary=False, transaction=False):
+    """Yield a cursor on a pooled connection and always return the connection.
+
+    Pooled connections run in autocommit mode; pass transaction=True to group
+    statements into one transaction that is rolled back on error.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    cursor = conn.cursor(dictionary=dictionary)
     try:
-        connection = mysql.connector.connect(**DATABASE_CONFIG)
-        return connection
-    except Exception as e:
-        logger.error(f"Database connection error: {e}")
-        return None
+        if transaction:
+            conn.start_transaction()
+        yield cursor
+        if transaction:
+            conn.commit()
+    except Exception:
+        if transaction:
+            conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_bearer_token():
+    """Return the token from the Authorization header, or None"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[7:]
+    return header.partition(' ')[2] or None
+
+def today():
+    """Today's UTC date, computed once per request"""
+    if 'today' not in g:
+        g.today = datetime.now(timezone.utc).date()
+    return g.today
+
+def is_subscription_expired(user):
+    # The connector returns DATE columns as datetime.date, so compare directly
+    expiry = user['subscription_expiry']
+    if not expiry:
+        return False
+    if isinstance(expiry, datetime):
+        expiry = expiry.date()
+    return expiry < today()
+
+# Signing key as bytes and a reusable JWS encoder, so issuing a token skips the
+# per-call key encoding and PyJWT's payload/claims handling
+_JWT_KEY = app.config['SECRET_KEY'].encode() if app.config['SECRET_KEY'] else None
+_jws = jwt.PyJWS()
+
+def issue_token(user_id, expires_in):
+    """Sign an HS256 token for user_id that expires in expires_in seconds"""
+    payload = json.dumps(
+        {'user_id': user_id, 'exp': int(time.time()) + expires_in}, separators=(',', ':')
+    ).encode()
+    return _jws.encode(payload, _JWT_KEY, algorithm='HS256')
+
+# Columns handlers read from a user row; password and tokens stay out of the
+# cached auth row
+USER_COLUMNS = "id, email, name, subscription, subscription_expiry"
+
+# Validated tokens, keyed by token digest. A token's claims never change, so
+# they are kept until it expires; the user row is only reused for
+# AUTH_CACHE_TTL seconds so subscription changes show up quickly.
+# Invalid tokens are never cached.
+_token_cache = TLRUCache(
+    maxsize=10000, ttu=lambda _key, claims, _now: claims.get('exp', float('inf')), timer=time.time
+)
+_auth_cache = TLRUCache(
+    maxsize=10000, ttu=lambda _key, entry, now: min(entry[0], now + AUTH_CACHE_TTL), timer=time.time
+)
+_auth_cache_lock = threading.Lock()
+
+def _token_key(token):
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def decode_token(token):
+    """Return the claims of a valid token; raises a jwt exception otherwise"""
+    # Reject obvious garbage before hashing, parsing and running the HMAC
+    if len(token) > MAX_TOKEN_LENGTH or token.count('.') != 2:
+        raise jwt.DecodeError("Malformed token")
+    key = _token_key(token)
+    with _auth_cache_lock:
+        claims = _token_cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, _JWT_KEY, **_JWT_DECODE_OPTS)
+        with _auth_cache_lock:
+            _token_cache[key] = claims
+    return claims
+
+def forget_token(token):
+    """Drop a token from the auth caches, e.g. on logout"""
+    key = _token_key(token)
+    with _auth_cache_lock:
+        _token_cache.pop(key, None)
+        _auth_cache.pop(key, None)
+
+def _authenticate(token):
+    """Return the user for a valid token, or None if the user no longer exists.
+
+    Raises a jwt exception for invalid tokens. The user row is cached for
+    AUTH_CACHE_TTL seconds, never past the token's own expiry.
+    """
+    key = _token_key(token)
+    with _auth_cache_lock:
+        cached = _auth_cache.get(key)
+    if cached:
+        return cached[1]
+
+    data = decode_token(token)
+
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute(f"SELECT {USER_COLUMNS} FROM users WHERE id = %s", (data['user_id'],))
+        current_user = cursor.fetchone()
+
+    if current_user:
+        with _auth_cache_lock:
+            _auth_cache[key] = (data.get('exp', float('inf')), current_user)
+    return current_user
 
 # Fixed token_required decorator - separate authentication from subscription validation
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1]
+        token = get_bearer_token()
         
         if not token:
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM users WHERE id = %s", (data['user_id'],))
-            current_user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            current_user = _authenticate(token)
             
             if not current_user:
                 return jsonify({'message': 'Invalid token'}), 401
@@ -119,35 +397,24 @@ def subscription_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         # First check if user is authenticated
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1]
+        token = get_bearer_token()
         
         if not token:
             return jsonify({'message': 'Token is missing'}), 401
         
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM users WHERE id = %s", (data['user_id'],))
-            current_user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            current_user = _authenticate(token)
             
             if not current_user:
                 return jsonify({'message': 'Invalid token'}), 401
 
             # Check subscription status only for subscription-required endpoints
-            if current_user['subscription_expiry']:
-                expiry_date = datetime.strptime(str(current_user['subscription_expiry']), '%Y-%m-%d').date()
-                if expiry_date < datetime.now().date():
-                    return jsonify({
-                        'message': 'Subscription expired', 
-                        'subscription_expired': True,
-                        'subscription_expiry': str(current_user['subscription_expiry'])
-                    }), 403
+            if is_subscription_expired(current_user):
+                return jsonify({
+                    'message': 'Subscription expired', 
+                    'subscription_expired': True,
+                    'subscription_expiry': str(current_user['subscription_expiry'])
+                }), 403
                 
         except Exception as e:
             return jsonify({'message': 'Invalid token'}), 401
@@ -156,6 +423,52 @@ def subscription_required(f):
     
     return decorated
 
+def hash_password(password):
+    return password_hasher.hash(password)
+
+def verify_password(stored, provided):
+    """Check a password against the stored value in constant time.
+
+    Older accounts may still hold a werkzeug pbkdf2/scrypt hash or plain text;
+    those are checked as before and upgraded on the next successful sign in.
+    """
+    if stored.startswith('$argon2'):
+        try:
+            return password_hasher.verify(stored, provided)
+        except (VerificationError, InvalidHashError):
+            return False
+    if stored.startswith(('pbkdf2:', 'scrypt:')):
+        return check_password_hash(stored, provided)
+    return hmac.compare_digest(stored.encode(), provided.encode())
+
+def password_needs_rehash(stored):
+    """True if stored isn't an argon2 hash with the current parameters"""
+    return not stored.startswith('$argon2') or password_hasher.check_needs_rehash(stored)
+
+def upload_extension(filename):
+    """Lower-cased extension of an uploaded file, or '' if it isn't a plain one"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,5}', extension) else ''
+
+def upload_size(file_storage):
+    """Size in bytes of an upload werkzeug has already spooled.
+
+    FileStorage.content_length comes from an optional per-part header that
+    browsers don't send, so measure the stream instead.
+    """
+    stream = file_storage.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def save_upload(file_storage, folder):
+    """Stream an upload to a server-generated name in folder and return the path"""
+    path = os.path.join(folder, uuid.uuid4().hex + upload_extension(file_storage.filename))
+    with open(path, 'wb') as dst:
+        shutil.copyfileobj(file_storage.stream, dst, UPLOAD_COPY_BUFFER)
+    return path
+
 def get_user_output_folder(user_id):
     """Generate and ensure existence of user-specific output folder"""
     user_folder = os.path.join(OUTPUT_BASE_FOLDER, f"user_{user_id}")
@@ -165,120 +478,368 @@ def get_user_output_folder(user_id):
 def get_random_duration(min_time, max_time):
     return random.uniform(min_time, max_time)
 
-def apply_transition_effects(clip1, clip2, transition_type, duration):
-    if transition_type == "fade":
-        return clip1.fadeout(duration), clip2.fadein(duration)
-    elif transition_type == "slide":
-        return clip1.set_start(clip1.end), clip2.set_start(clip1.end + duration)
-    return clip1, clip2
+def probe_duration(path):
+    """Return the duration of a media file in seconds"""
+    result = subprocess.run(
+        [FFPROBE_BIN, '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', path],
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip())
+
+@functools.lru_cache(maxsize=None)
+def get_video_encoder():
+    """Pick the fastest H.264 encoder that works on this host (checked once per process)"""
+    if VIDEO_ENCODER:
+        return VIDEO_ENCODER
+    for encoder in ('h264_nvenc', 'h264_qsv'):
+        # ffmpeg builds list hardware encoders even without the device, so try a tiny encode
+        try:
+            result = subprocess.run(
+                [FFMPEG_BIN, '-hide_banner', '-loglevel', 'error',
+                 '-f', 'lavfi', '-i', 'color=black:s=256x256:d=0.1',
+                 '-c:v', encoder, '-f', 'null', '-'],
+                capture_output=True, timeout=30
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if result.returncode == 0:
+            logger.info(f"Using {encoder} for video encoding")
+            return encoder
+    return 'libx264'
+
+def escape_filter_value(value):
+    """Quote a value for use as a filter option inside -filter_complex.
+
+    ffmpeg unescapes twice: the filtergraph parser strips the outer quotes,
+    then the filter's option parser sees the value bare, so \\, ' and : are
+    escaped for that level first.
+    """
+    value = value.replace('\\', '\\\\').replace("'", "\\'").replace(':', '\\:')
+    return "'" + value.replace("'", "'\\''") + "'"
+
+def build_ffmpeg_command(segments, voice_path, background_path, output_path, total_duration,
+                         transition_type, transition_time, voice_volume, background_volume):
+    """Build a single ffmpeg invocation for the whole slideshow.
+
+    segments is a list of (image_path, duration, text_file) tuples; text_file is None
+    for segments without an overlay.
+    """
+    encoder = get_video_encoder()
+    xfade = XFADE_TRANSITIONS.get(transition_type)
+    use_xfade = bool(xfade) and transition_time > 0 and len(segments) > 1
+
+    cmd = [FFMPEG_BIN, '-y', '-hide_banner', '-loglevel', 'error']
+    filters = []
+
+    for i, (image_path, duration, text_file) in enumerate(segments):
+        # With xfade every segment overlaps the next one, so pad it by the transition
+        # time; the output is trimmed back to total_duration below
+        input_duration = duration + transition_time if use_xfade else duration
+        frames = max(1, round(input_duration * VIDEO_FPS))
+        # -framerate is an image2 option; the gif demuxer rejects it
+        if not image_path.lower().endswith('.gif'):
+            cmd += ['-framerate', str(VIDEO_FPS)]
+        cmd += ['-i', image_path]
+
+        # Scale, pad and draw the caption on the single decoded frame, then let
+        # loop repeat the finished frame instead of redoing that work per output frame.
+        # GIFs come in with a 1/100 timebase and no fixed frame rate; settb and fps give
+        # every segment the same timebase and a constant rate, which xfade requires.
+        chain = (
+            f"[{i}:v]trim=end_frame=1,"
+            f"scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}:force_original_aspect_ratio=decrease,"
+            f"pad={VIDEO_WIDTH}:{VIDEO_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+        )
+        if text_file:
+            drawtext = f"drawtext=textfile={escape_filter_value(text_file)}:expansion=none:fontsize=50:fontcolor=white:x=(w-text_w)/2:y=h-80"
+            if FFMPEG_FONTFILE:
+                drawtext += f":fontfile={escape_filter_value(FFMPEG_FONTFILE)}"
+            chain += f",{drawtext}"
+        filters.append(
+            f"{chain},format=yuv420p,loop=loop={frames - 1}:size=1:start=0,"
+            f"settb=1/{VIDEO_FPS},setpts=N/{VIDEO_FPS}/TB,fps={VIDEO_FPS}[v{i}]"
+        )
 
-def clear_folder(folder_path):
-    try:
-        if os.path.exists(folder_path):
-            for filename in os.listdir(folder_path):
-                file_path = os.path.join(folder_path, filename)
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-        return True
-    except Exception as e:
-        logger.error(f"Error clearing folder {folder_path}: {e}")
-        return False
+    if use_xfade:
+        previous = 'v0'
+        offset = 0.0
+        for i in range(1, len(segments)):
+            offset += segments[i - 1][1]
+            label = 'vout' if i == len(segments) - 1 else f"x{i}"
+            filters.append(
+                f"[{previous}][v{i}]xfade=transition={xfade}:duration={transition_time:.3f}:offset={offset:.3f}[{label}]"
+            )
+            previous = label
+    else:
+        inputs = ''.join(f"[v{i}]" for i in range(len(segments)))
+        filters.append(f"{inputs}concat=n={len(segments)}:v=1:a=0[vout]")
+
+    # Voice drives the length; the background track is looped and cut to match
+    voice_index = len(segments)
+    cmd += ['-i', voice_path, '-stream_loop', '-1', '-i', background_path]
+    filters.append(
+        f"[{voice_index}:a][{voice_index + 1}:a]amix=inputs=2:duration=first:normalize=0:"
+        f"weights='{voice_volume} {background_volume}'[aout]"
+    )
 
-def generate_unique_filename():
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    cmd += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[vout]', '-map', '[aout]',
+        '-t', f"{total_duration:.3f}",
+        '-c:v', encoder, *VIDEO_ENCODER_ARGS.get(encoder, []),
+        '-r', str(VIDEO_FPS),
+        '-c:a', 'aac', '-movflags', '+faststart',
+        '-f', 'mp4', output_path
+    ]
+    return cmd
+
+def render_video(image_paths, text_overlays, voice_path, background_path, output_path, work_folder,
+                 voice_duration, min_time, max_time, transition_type, transition_time,
+                 voice_volume, background_volume):
+    """Render the slideshow with ffmpeg, cut to the length of the voice track"""
+    segments = []
+    overlay_files = {}  # Repeated captions share one text file
+    total_duration = 0
+    img_index = 0
+
+    while total_duration < voice_duration and image_paths:
+        duration = min(get_random_duration(min_time, max_time),
+                       voice_duration - total_duration)
+
+        img_path = image_paths[img_index % len(image_paths)]
+        text_file = None
+        if img_index < len(text_overlays) and text_overlays[img_index]:
+            text = text_overlays[img_index]
+            text_file = overlay_files.get(text)
+            if text_file is None:
+                # Captions go through a file so they never pass the filtergraph parser;
+                # expansion=none keeps drawtext from treating % and \ in them specially
+                text_file = os.path.join(work_folder, f"overlay_{len(overlay_files)}.txt")
+                with open(text_file, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                overlay_files[text] = text_file
+
+        segments.append((img_path, duration, text_file))
+        total_duration += duration
+        img_index += 1
+
+    cmd = build_ffmpeg_command(
+        segments, voice_path, background_path, output_path, voice_duration,
+        transition_type, transition_time, voice_volume, background_volume
+    )
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        logger.error(f"ffmpeg failed with code {result.returncode}: {result.stderr[-2000:]}")
+        raise RuntimeError("Video rendering failed")
+
+def generate_unique_filename(user_id):
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     random_suffix = ''.join(random.choices('0123456789', k=4))
-    return f"video_{timestamp}_{random_suffix}.mp4"
+    return f"video_u{user_id}_{timestamp}_{random_suffix}.mp4"
 
 def generate_order_id():
-    return f"order_{str(uuid.uuid4())[:8]}"
+    # ULIDs sort by creation time, so new ids append to the order_id index
+    return f"order_{ULID()}"
 
-def update_subscription_status(user_id, subscription_type, duration_days):
+def save_video_record(user_id, filename, duration, status='ready'):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Calculate new expiry date
-        new_expiry = datetime.now() + timedelta(days=duration_days)
-        
-        cursor.execute(
-            """UPDATE users 
-            SET subscription = %s, subscription_expiry = %s 
-            WHERE id = %s""",
-            (subscription_type, new_expiry.date(), user_id)
-        )
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO videos (
+                    user_id, filename, duration, status, created_at
+                ) VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+            """, (
+                user_id,
+                filename,
+                duration,
+                status
+            ))
         return True
     except Exception as e:
-        logger.error(f"Error updating subscription: {e}")
+        logger.error(f"Error saving video record: {e}")
         return False
 
-def save_video_record(user_id, filename, duration):
+def update_video_status(filename, status):
+    """Set the status of a video row.
+
+    Returns False if the row no longer exists and None if the database
+    couldn't be reached, so callers can tell a deleted video from an outage.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO videos (
-                user_id, filename, duration, created_at
-            ) VALUES (%s, %s, %s, %s)
-        """, (
-            user_id,
-            filename,
-            duration,
-            datetime.now()
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True
+        with db_cursor() as cursor:
+            cursor.execute("UPDATE videos SET status = %s WHERE filename = %s", (status, filename))
+            return cursor.rowcount > 0
     except Exception as e:
-        logger.error(f"Error saving video record: {e}")
-        return False
+        logger.error(f"Error updating video status: {e}")
+        return None
+
+def record_render_outcome(filename, status):
+    """update_video_status, retried for up to RENDER_STALE_AFTER while the database is unreachable.
+
+    The render stays in _inflight_renders meanwhile, so the watchdog keeps
+    heartbeating it instead of failing it.
+    """
+    deadline = time.monotonic() + RENDER_STALE_AFTER
+    delay = 1
+    while True:
+        updated = update_video_status(filename, status)
+        if updated is not None or time.monotonic() + delay > deadline:
+            return updated
+        time.sleep(delay)
+        delay = min(delay * 2, 30)
+
+@contextmanager
+def render_slot():
+    """Hold one of the RENDER_CONCURRENCY render slots shared by this host.
+
+    Slots are flock()ed files, so every worker process competes for the same
+    ones and the kernel releases a slot if its process dies mid-render.
+    """
+    if fcntl is None:
+        yield
+        return
+    while True:
+        for i in range(RENDER_CONCURRENCY):
+            lock_file = open(os.path.join(RENDER_LOCK_FOLDER, f"slot{i}.lock"), 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            try:
+                yield
+            finally:
+                lock_file.close()  # Closing the file releases the lock
+            return
+        time.sleep(1)
+
+# Videos queued or rendering in this process, by output filename
+_inflight_renders = set()
+_inflight_lock = threading.Lock()
+
+def render_workdir_prefix(output_filename):
+    return f"gv_{os.path.splitext(output_filename)[0]}_"
+
+def recover_stale_renders():
+    """Heartbeat this process's renders and fail pending ones nobody is rendering.
+
+    A render is lost if its worker restarts or is killed; its row would stay
+    'pending' forever. Live processes refresh render_heartbeat_at every
+    RENDER_HEARTBEAT_INTERVAL, so a pending row without a recent heartbeat
+    belongs to a dead process.
+    """
+    with _inflight_lock:
+        inflight = list(_inflight_renders)
+    stale_sql = "status = 'pending' AND COALESCE(render_heartbeat_at, created_at) < CURRENT_TIMESTAMP - INTERVAL %s SECOND"
+    with db_cursor() as cursor:
+        if inflight:
+            placeholders = ', '.join(['%s'] * len(inflight))
+            cursor.execute(
+                f"UPDATE videos SET render_heartbeat_at = CURRENT_TIMESTAMP WHERE filename IN ({placeholders})",
+                inflight
+            )
+        cursor.execute(f"SELECT user_id, filename FROM videos WHERE {stale_sql}", (RENDER_STALE_AFTER,))
+        for user_id, filename in cursor.fetchall():
+            # Re-check in the UPDATE in case another process just heartbeated it
+            cursor.execute(
+                f"UPDATE videos SET status = 'failed' WHERE filename = %s AND {stale_sql}",
+                (filename, RENDER_STALE_AFTER)
+            )
+            if not cursor.rowcount:
+                continue
+            logger.warning("Marked abandoned render %s as failed", filename)
+            user_folder = os.path.join(OUTPUT_BASE_FOLDER, f"user_{user_id}")
+            # The output exists if the render finished but its status update never landed
+            for path in (os.path.join(user_folder, f".{filename}.part"), os.path.join(user_folder, filename)):
+                if os.path.exists(path):
+                    os.remove(path)
+            tmp_parent = RENDER_TMP_FOLDER or tempfile.gettempdir()
+            for workdir in glob.glob(os.path.join(tmp_parent, glob.escape(render_workdir_prefix(filename)) + '*')):
+                shutil.rmtree(workdir, ignore_errors=True)
+
+def _render_watchdog():
+    while True:
+        try:
+            recover_stale_renders()
+        except Exception as e:
+            logger.error("Stale render recovery failed: %s", e)
+        time.sleep(RENDER_HEARTBEAT_INTERVAL)
+
+threading.Thread(target=_render_watchdog, name='render-watchdog', daemon=True).start()
+
+def render_video_job(user_id, output_filename, workdir, render_args):
+    """Background task: render a queued video and record the outcome"""
+    user_folder = get_user_output_folder(user_id)
+    output_path = os.path.join(user_folder, output_filename)
+    # Render under a hidden name so a half-written file is never served
+    partial_path = os.path.join(user_folder, f".{output_filename}.part")
 
-def save_payment_record(order_id, user_id, amount, payment_details):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO payments (
-                order_id, cf_order_id, user_id, amount, payment_status, 
-                payment_method, transaction_id, payment_date
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            order_id,
-            payment_details.get('cf_order_id'),
-            user_id,
-            amount,
-            payment_details.get('order_status'),
-            payment_details.get('payment_method'),
-            payment_details.get('cf_payment_id'),
-            datetime.now()
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True
+        with render_slot():
+            render_video(output_path=partial_path, **render_args)
+        os.replace(partial_path, output_path)
+        updated = record_render_outcome(output_filename, 'ready')
+        if updated is False:
+            # The video was deleted while it was rendering
+            os.remove(output_path)
+        elif updated is None:
+            # Left pending; once the heartbeat lapses the watchdog fails it and removes the file
+            logger.error("Could not mark rendered video %s ready", output_filename)
     except Exception as e:
-        logger.error(f"Error saving payment record: {e}")
+        logger.error(f"Error rendering video {output_filename}: {e}")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        record_render_outcome(output_filename, 'failed')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        with _inflight_lock:
+            _inflight_renders.discard(output_filename)
+
+def complete_order(cursor, order_id, payment_details, user_id=None):
+    """Apply a paid order once, using the caller's cursor inside its transaction.
+
+    Marks the order COMPLETED, extends its user's subscription and records the
+    payment. Returns False without writing anything if the order doesn't exist
+    (or isn't user_id's) or is already completed, so payment_success and the
+    webhook can't both apply the same payment.
+    """
+    cursor.execute("""
+        UPDATE payment_orders o
+        JOIN users u ON u.id = o.user_id
+        SET u.subscription = o.subscription_type,
+            u.subscription_expiry = CURRENT_DATE + INTERVAL o.duration_days DAY,
+            o.status = 'COMPLETED',
+            o.updated_at = CURRENT_TIMESTAMP,
+            o.payment_response = %s
+        WHERE o.order_id = %s AND o.status <> 'COMPLETED'
+        AND (%s IS NULL OR o.user_id = %s)
+    """, (json.dumps(payment_details), order_id, user_id, user_id))
+    if not cursor.rowcount:
         return False
 
+    cursor.execute("""
+        INSERT INTO payments (
+            order_id, cf_order_id, user_id, amount, payment_status,
+            payment_method, transaction_id, payment_date
+        )
+        SELECT order_id, %s, user_id, amount, %s, %s, %s, CURRENT_TIMESTAMP
+        FROM payment_orders
+        WHERE order_id = %s
+    """, (
+        payment_details.get('cf_order_id'),
+        payment_details.get('order_status'),
+        payment_details.get('payment_method', 'unknown'),
+        payment_details.get('cf_payment_id', ''),
+        order_id
+    ))
+    return True
+
 def verify_payment_status(order_id):
     try:
-        headers = {
-            "x-client-id": CASHFREE_APP_ID,
-            "x-client-secret": CASHFREE_SECRET_KEY,
-            "x-api-version": "2022-09-01"
-        }
-        
-        response = requests.get(
+        response = cashfree_session.get(
             f"{CASHFREE_BASE_URL}/orders/{order_id}",
-            headers=headers
+            timeout=CASHFREE_TIMEOUT
         )
         
         if response.status_code == 200:
@@ -294,37 +855,119 @@ def verify_payment_status(order_id):
 def get_user_video_count(user_id):
     """Get the number of videos created by a user"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT COUNT(*) as count FROM videos WHERE user_id = %s", (user_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return result['count']
+        with db_cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM videos WHERE user_id = %s", (user_id,))
+            (count,) = cursor.fetchone()
+        return count
     except Exception as e:
         logger.error(f"Error getting user video count: {e}")
         return 0
 
 # Email sending function
-def send_email(to_email, subject, body):
+# Each email worker thread keeps its own logged-in SMTP connection
+_smtp_local = threading.local()
+
+def _close_smtp():
+    server = getattr(_smtp_local, 'server', None)
+    _smtp_local.server = None
+    if server:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+def _smtp_connection():
+    """Return this thread's SMTP connection, reconnecting if it is idle or dead"""
+    server = getattr(_smtp_local, 'server', None)
+    if server and time.monotonic() - _smtp_local.last_used < SMTP_IDLE_TIMEOUT:
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+    _close_smtp()
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    server.starttls()
+    server.login(SMTP_USER, SMTP_PASSWORD)
+    _smtp_local.server = server
+    return server
+
+def send_email(to_email, subject, body, html_body=None):
     try:
         msg = EmailMessage()
         msg.set_content(body)
+        if html_body:
+            msg.add_alternative(html_body, subtype='html')
         msg['Subject'] = subject
-        msg['From'] = os.getenv('SMTP_FROM')
+        msg['From'] = SMTP_FROM
         msg['To'] = to_email
         
-        # Connect to SMTP server and send
-        server = smtplib.SMTP(os.getenv('SMTP_HOST'), int(os.getenv('SMTP_PORT')))
-        server.starttls()
-        server.login(os.getenv('SMTP_USER'), os.getenv('SMTP_PASSWORD'))
-        server.send_message(msg)
-        server.quit()
+        try:
+            _smtp_connection().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the connection between the NOOP and the send
+            _close_smtp()
+            _smtp_connection().send_message(msg)
+        _smtp_local.last_used = time.monotonic()
         return True
     except Exception as e:
-        logger.error(f"Error sending email: {e}")
+        logger.error(f"Error sending email to {to_email}: {e}")
+        _close_smtp()
         return False
-    
+
+# Static welcome markup; only the escaped name is substituted per email
+WELCOME_HTML = """
+    <html>
+        <head>
+            <style>
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+                .header { background-color: #4a86e8; color: white; padding: 10px 20px; text-align: center; }
+                .content { padding: 20px; background-color: #f9f9f9; }
+                .footer { text-align: center; margin-top: 20px; font-size: 12px; color: #777; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>Welcome to Our GEN VIDEO AI</h1>
+                </div>
+                <div class="content">
+                    <h2>Hello {{NAME}},</h2>
+                    <p>Thank you for signing up with us! We're excited to have you on board.</p>
+                    <p>Your account has been successfully created. Please upgrade to Pro at just ₹10/month and enjoy unlimited video generation.</p>
+                    <ul>
+                    </ul>
+                    <p>If you have any questions or need assistance, feel free to contact our support team.</p>
+                    <p>Best regards,<br>The Team</p>
+                </div>
+                <div class="footer">
+                    <p>This is an automated message. Please do not reply to this email.</p>
+                </div>
+            </div>
+        </body>
+    </html>
+    """
+
+def send_welcome_email(to_email, name):
+    """Send the signup welcome email; failures are logged, never raised"""
+    html_content = WELCOME_HTML.replace('{{NAME}}', html.escape(name))
+    if send_email(
+        to_email,
+        'Welcome to Our Platform! GEN VIDEO AI',
+        "Thank you for signing up to our platform!",
+        html_content
+    ):
+        logger.info(f"Welcome email sent to {to_email}")
+
+def send_reset_email(to_email, reset_url):
+    """Send the password reset link; failures are logged, never raised"""
+    if send_email(
+        to_email,
+        'Password Reset Request',
+        f"Click the link to reset your password: {reset_url}"
+    ):
+        logger.info(f"Password reset email sent to {to_email}")
 
 # Routes
 
@@ -332,16 +975,21 @@ def send_email(to_email, subject, body):
 @token_required
 def clear_cache_route(current_user):
     try:
-        user_folder = get_user_output_folder(current_user['id'])
-        success = clear_folder(user_folder)
+        # Drop the whole folder in one pass rather than unlinking file by file
+        user_folder = os.path.join(OUTPUT_BASE_FOLDER, f"user_{current_user['id']}")
+        success = True
+        try:
+            shutil.rmtree(user_folder)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error clearing folder {user_folder}: {e}")
+            success = False
+        os.makedirs(user_folder, exist_ok=True)
         
         # Also clear database records
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM videos WHERE user_id = %s", (current_user['id'],))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_cursor() as cursor:
+            cursor.execute("DELETE FROM videos WHERE user_id = %s", (current_user['id'],))
         
         if success:
             return jsonify({"message": "Cache cleared successfully"}), 200
@@ -363,90 +1011,108 @@ def delete_video(current_user):
             return jsonify({"error": "Video ID or Filename is required"}), 400
 
         # Check if video belongs to the user
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        if video_id:
-            cursor.execute("SELECT * FROM videos WHERE filename = %s AND user_id = %s", (video_id, current_user['id']))
-        else:
-            cursor.execute("SELECT * FROM videos WHERE filename = %s AND user_id = %s", (filename, current_user['id']))
+        with db_cursor() as cursor:
+            cursor.execute("SELECT filename, status FROM videos WHERE filename = %s AND user_id = %s",
+                           (video_id or filename, current_user['id']))
+            video = cursor.fetchone()
+            
+            if not video:
+                return jsonify({"error": "Video not found or unauthorized"}), 404
 
-        video = cursor.fetchone()
-        
-        if not video:
-            return jsonify({"error": "Video not found or unauthorized"}), 404
+            video_filename, status = video
+            user_folder = get_user_output_folder(current_user['id'])
+            video_path = os.path.join(user_folder, video_filename)  # Always use filename from DB
 
-        user_folder = get_user_output_folder(current_user['id'])
-        video_path = os.path.join(user_folder, video['filename'])  # Always use filename from DB
+            # Pending and failed renders have no file yet
+            if status == 'ready' and not os.path.exists(video_path):
+                logger.error(f"Video not found at path: {video_path}")
+                return jsonify({"error": "Video not found"}), 404
 
-        if not os.path.exists(video_path):
-            logger.error(f"Video not found at path: {video_path}")
-            return jsonify({"error": "Video not found"}), 404
-
-        try:
-            os.remove(video_path)
-            # Delete from database
-            if video_id:
-                cursor.execute("DELETE FROM videos WHERE filename = %s", (video_id,))
-            else:
-                cursor.execute("DELETE FROM videos WHERE filename = %s", (filename,))
-                
-            conn.commit()
-            return jsonify({"message": "Video deleted successfully"}), 200
-        except OSError as e:
-            logger.error(f"Error deleting video {video['filename']}: {e}")
-            return jsonify({"error": f"Failed to delete video: {str(e)}"}), 500
+            try:
+                if os.path.exists(video_path):
+                    os.remove(video_path)
+                # Delete from database; filename is unique so this hits one row by index
+                cursor.execute("DELETE FROM videos WHERE filename = %s", (video_filename,))
+
+                return jsonify({"message": "Video deleted successfully"}), 200
+            except OSError as e:
+                logger.error(f"Error deleting video {video_filename}: {e}")
+                return jsonify({"error": f"Failed to delete video: {str(e)}"}), 500
     except Exception as e:
         logger.error(f"Unexpected error in delete_video: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/get_videos', methods=['GET'])
 @token_required
 def get_videos(current_user):
     try:
-        page = max(1, int(request.args.get('page', 1)))
         limit = max(1, int(request.args.get('limit', 6)))
-
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get total count
-        cursor.execute("""
-            SELECT COUNT(*) as total 
-            FROM videos 
-            WHERE user_id = %s
-        """, (current_user['id'],))
-        total = cursor.fetchone()['total']
-
-        # Get paginated videos
-        cursor.execute("""
-            SELECT * FROM videos 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC 
-            LIMIT %s OFFSET %s
-        """, (current_user['id'], limit, (page - 1) * limit))
+        # Clients that pass back nextCursor get keyset pagination, which avoids
+        # scanning past every earlier row the way OFFSET does
+        page_cursor = request.args.get('cursor')
+        if page_cursor:
+            try:
+                cursor_created_at, cursor_filename = page_cursor.split('|', 1)
+                cursor_created_at = datetime.fromisoformat(cursor_created_at)
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+
+        with db_cursor(dictionary=True) as cursor:
+            # One round trip: the window count rides along with the page
+            if page_cursor:
+                cursor.execute("""
+                    SELECT filename, created_at, duration, status, COUNT(*) OVER() AS total
+                    FROM videos
+                    WHERE user_id = %s
+                      AND (created_at < %s OR (created_at = %s AND filename < %s))
+                    ORDER BY created_at DESC, filename DESC
+                    LIMIT %s
+                """, (current_user['id'], cursor_created_at, cursor_created_at, cursor_filename, limit))
+            else:
+                page = max(1, int(request.args.get('page', 1)))
+                cursor.execute("""
+                    SELECT filename, created_at, duration, status, COUNT(*) OVER() AS total
+                    FROM videos
+                    WHERE user_id = %s
+                    ORDER BY created_at DESC, filename DESC
+                    LIMIT %s OFFSET %s
+                """, (current_user['id'], limit, (page - 1) * limit))
+            rows = cursor.fetchall()
+
+            if rows:
+                total = rows[0]['total']
+            elif page_cursor or page == 1:
+                total = 0
+            else:
+                # Past the last page the window count is unavailable
+                cursor.execute("SELECT COUNT(*) AS total FROM videos WHERE user_id = %s", (current_user['id'],))
+                total = cursor.fetchone()['total']
         
         videos = []
-        for video in cursor.fetchall():
+        for video in rows:
             videos.append({
                 "videoId": video['filename'],
                 "title": os.path.splitext(video['filename'])[0],
                 "url": f"/video/{video['filename']}",
                 "createdAt": video['created_at'].isoformat(),
-                "duration": video['duration']
+                "duration": video['duration'],
+                "status": video['status']
             })
 
-        cursor.close()
-        conn.close()
+        # With a cursor, total counts the rows from this page onwards
+        has_more = total > len(rows) if page_cursor else total > (page * limit)
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = f"{rows[-1]['created_at'].isoformat()}|{rows[-1]['filename']}"
 
-        return jsonify({
+        response = {
             "videos": videos,
-            "hasMore": total > (page * limit),
-            "total": total
-        })
+            "hasMore": has_more,
+            "nextCursor": next_cursor
+        }
+        if not page_cursor:
+            response["total"] = total
+        return jsonify(response)
 
     except Exception as e:
         logger.error(f"Error in get_videos: {e}")
@@ -455,22 +1121,32 @@ def get_videos(current_user):
 @app.route("/video/<filename>")
 def serve_video(filename):
     try:
-        # Extract user ID from filename or query DB to find the owner
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT user_id FROM videos 
-            WHERE filename = %s
-        """, (filename,))
-        video = cursor.fetchone()
-        
-        if not video:
-            return jsonify({"error": "Video not found"}), 404
+        # Extract user ID from filename or query DB to find the owner.
+        # Browsers issue many range requests per video, so skip the DB when we can;
+        # the full match guarantees the name is a plain file inside the user folder.
+        match = VIDEO_FILENAME_PATTERN.fullmatch(filename)
+        if match:
+            user_id = match.group(1)
+        else:
+            # Videos created before the owner id was part of the name
+            with db_cursor() as cursor:
+                cursor.execute("""
+                    SELECT user_id FROM videos 
+                    WHERE filename = %s
+                """, (filename,))
+                video = cursor.fetchone()
             
-        user_id = video['user_id']
-        cursor.close()
-        conn.close()
+            if not video:
+                return jsonify({"error": "Video not found"}), 404
+                
+            (user_id,) = video
         
+        if VIDEO_ACCEL_REDIRECT_PREFIX:
+            # nginx sends the bytes with sendfile(2) and handles range requests
+            response = Response(mimetype='video/mp4')
+            response.headers['X-Accel-Redirect'] = f"{VIDEO_ACCEL_REDIRECT_PREFIX.rstrip('/')}/user_{user_id}/{filename}"
+            return response
+
         # Generate the appropriate user folder path
         user_folder = os.path.join(OUTPUT_BASE_FOLDER, f"user_{user_id}")
         
@@ -527,132 +1203,108 @@ def generate_video(current_user):
         if 'images' not in request.files or 'voice' not in request.files or 'backgroundSound' not in request.files:
             return jsonify({"error": "Missing required files"}), 400
 
-        images = request.files.getlist('images')
+        images = [img for img in request.files.getlist('images') if img and img.filename]
         voice_file = request.files['voice']
         background_sound = request.files['backgroundSound']
 
-        # Clear previous files
-        for folder in [IMAGE_FOLDER, VOICE_FOLDER, BACKGROUND_FOLDER]:
-            clear_folder(folder)
+        if not images:
+            return jsonify({"error": "No valid images uploaded"}), 400
 
-        # Save uploaded files
-        image_paths = []
+        # Reject bad uploads before anything is written to disk
         for img in images:
-            if img and img.filename:
-                filename = secure_filename(img.filename)
-                filepath = os.path.join(IMAGE_FOLDER, filename)
-                img.save(filepath)
-                image_paths.append(filepath)
-
-        # Apply image selection logic
-        if image_selection == "random":
-            random.shuffle(image_paths)
-        elif image_selection == "descending":
-            image_paths.reverse()
-        # "ascending" is default and requires no change to the list
-
-        voice_path = os.path.join(VOICE_FOLDER, secure_filename(voice_file.filename))
-        voice_file.save(voice_path)
-
-        background_path = os.path.join(BACKGROUND_FOLDER, secure_filename(background_sound.filename))
-        background_sound.save(background_path)
-
-        # Process audio
-        voice_audio = AudioFileClip(voice_path).volumex(voice_volume)
-        voice_duration = voice_audio.duration
-
-        background_audio = AudioFileClip(background_path).volumex(background_volume)
-        if background_audio.duration < voice_duration:
-            background_audio = background_audio.loop(duration=voice_duration)
-        else:
-            background_audio = background_audio.subclip(0, voice_duration)
-
-        # Generate video clips
-        clips = []
-        total_duration = 0
-        img_index = 0
+            if upload_extension(img.filename) not in ALLOWED_IMAGE_EXTENSIONS:
+                return jsonify({"error": f"Unsupported image type: {img.filename}"}), 400
+            if upload_size(img) > MAX_IMAGE_SIZE:
+                return jsonify({"error": f"Image too large: {img.filename}"}), 413
 
-        while total_duration < voice_duration and image_paths:
-            duration = min(get_random_duration(min_time, max_time), 
-                         voice_duration - total_duration)
-            
-            img_path = image_paths[img_index % len(image_paths)]
-            clip = ImageClip(img_path).set_duration(duration)
-
-            if img_index < len(text_overlays) and text_overlays[img_index]:
-                text = TextClip(
-                    text_overlays[img_index],
-                    fontsize=50,
-                    color='white',
-                    size=clip.size,
-                    method="caption"
-                ).set_position(('center', 'bottom')).set_duration(duration)
-                clip = CompositeVideoClip([clip, text])
-
-            clips.append(clip)
-            total_duration += duration
-            img_index += 1
-
-        # Apply transitions and combine clips
-        final_clips = [clips[0]]
-        for i in range(1, len(clips)):
-            clip1, clip2 = apply_transition_effects(
-                final_clips[-1], 
-                clips[i], 
-                transition_type, 
-                transition_time
-            )
-            final_clips[-1] = clip1
-            final_clips.append(clip2)
+        # Each job gets a private work dir so any number of renders can run side by side
+        output_filename = generate_unique_filename(current_user['id'])
+        workdir = tempfile.mkdtemp(prefix=render_workdir_prefix(output_filename), dir=RENDER_TMP_FOLDER)
 
-        # Create final video
-        final_video = concatenate_videoclips(final_clips, method="compose")
-        final_video = final_video.set_audio(
-            CompositeAudioClip([voice_audio, background_audio])
-        )
-
-        # Save video to user-specific folder
-        output_filename = generate_unique_filename()
-        user_folder = get_user_output_folder(current_user['id'])
-        output_path = os.path.join(user_folder, output_filename)
-        
-        final_video.write_videofile(
-            output_path,
-            codec="libx264",
-            audio_codec="aac",
-            fps=24,
-            threads=4,
-            logger=None
-        )
+        queued = False
+        try:
+            # Save uploaded images concurrently; map keeps upload order
+            with ThreadPoolExecutor(max_workers=IMAGE_SAVE_WORKERS) as pool:
+                image_paths = list(pool.map(save_upload, images, [workdir] * len(images)))
+
+            # Apply image selection logic
+            if image_selection == "random":
+                random.shuffle(image_paths)
+            elif image_selection == "descending":
+                image_paths.reverse()
+            # "ascending" is default and requires no change to the list
+
+            voice_path = save_upload(voice_file, workdir)
+            background_path = save_upload(background_sound, workdir)
+
+            voice_duration = probe_duration(voice_path)
+
+            # Record the pending video, then hand rendering to the background pool
+            if not save_video_record(current_user['id'], output_filename, voice_duration, status='pending'):
+                return jsonify({"error": "Failed to queue video"}), 500
+
+            with _inflight_lock:
+                _inflight_renders.add(output_filename)
+            render_executor.submit(render_video_job, current_user['id'], output_filename, workdir, {
+                "image_paths": image_paths,
+                "text_overlays": text_overlays,
+                "voice_path": voice_path,
+                "background_path": background_path,
+                "work_folder": workdir,
+                "voice_duration": voice_duration,
+                "min_time": min_time,
+                "max_time": max_time,
+                "transition_type": transition_type,
+                "transition_time": transition_time,
+                "voice_volume": voice_volume,
+                "background_volume": background_volume
+            })
+            queued = True
+        finally:
+            # Once queued, the job cleans up its own inputs
+            if not queued:
+                shutil.rmtree(workdir, ignore_errors=True)
+                with _inflight_lock:
+                    _inflight_renders.discard(output_filename)
 
-        # Save video record in database
-        save_video_record(current_user['id'], output_filename, voice_duration)
+        return jsonify({
+            "message": "Video generation started",
+            "jobId": output_filename,
+            "status": "pending",
+            "statusUrl": url_for('video_status', job_id=output_filename, _external=True),
+            "videoUrl": url_for('serve_video', filename=output_filename, _external=True),
+            "filename": output_filename,
+            "videoCount": video_count + 1,
+            "limit": MAX_VIDEOS_PER_USER
+        }), 202
 
-        # Clean up
-        final_video.close()
-        voice_audio.close()
-        background_audio.close()
-        for clip in clips:
-            clip.close()
+    except Exception as e:
+        logger.error(f"Error generating video: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        # Clear input files
-        for folder in [IMAGE_FOLDER, VOICE_FOLDER, BACKGROUND_FOLDER]:
-            clear_folder(folder)
+@app.route("/video_status/<job_id>", methods=["GET"])
+@token_required
+def video_status(current_user, job_id):
+    """Report the render status of a video queued by generate_video"""
+    try:
+        with db_cursor(dictionary=True) as cursor:
+            cursor.execute(
+                "SELECT status, duration FROM videos WHERE filename = %s AND user_id = %s",
+                (job_id, current_user['id'])
+            )
+            video = cursor.fetchone()
 
-        # Get updated video count
-        new_count = get_user_video_count(current_user['id'])
+        if not video:
+            return jsonify({"error": "Video not found"}), 404
 
-        video_url = url_for('serve_video', filename=output_filename, _external=True)
         return jsonify({
-            "message": "Video generated successfully",
-            "videoUrl": video_url,
-            "filename": output_filename,
-            "videoCount": new_count,
-            "limit": MAX_VIDEOS_PER_USER
+            "jobId": job_id,
+            "status": video['status'],
+            "duration": video['duration'],
+            "videoUrl": url_for('serve_video', filename=job_id, _external=True) if video['status'] == 'ready' else None
         }), 200
-
     except Exception as e:
-        logger.error(f"Error generating video: {e}")
+        logger.error(f"Error checking video status: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/')
@@ -663,14 +1315,8 @@ def home():
 def favicon():
     return '', 204  # No Content
 
-@app.route('/signin', methods=['POST', 'OPTIONS'])
+@app.route('/signin', methods=['POST'])
 def signin():
-    if request.method == 'OPTIONS':
-        response = jsonify({})
-        response.headers.add('Access-Control-Allow-Methods', 'POST')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
-        return response
-
     try:
         data = request.get_json()
 
@@ -688,39 +1334,38 @@ def signin():
             }), 500
 
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (data['email'],))
-        user = cursor.fetchone()
-
-        if not user:
-            return jsonify({
-                'success': False,
-                'message': 'User not found. Please sign up',
-                'needsSignup': True
-            }), 404
+        try:
+            cursor.execute(f"SELECT {USER_COLUMNS}, password FROM users WHERE email = %s", (data['email'],))
+            user = cursor.fetchone()
 
-        if user['password'] != data['password']:
-            return jsonify({
-                'success': False,
-                'message': 'Incorrect email or password'
-            }), 401
+            if not user:
+                return jsonify({
+                    'success': False,
+                    'message': 'User not found. Please sign up',
+                    'needsSignup': True
+                }), 404
 
-        # Check subscription status
-        subscription_expired = False
-        if user['subscription_expiry']:
-            subscription_expired = datetime.strptime(str(user['subscription_expiry']), '%Y-%m-%d').date() < datetime.now().date()
+            if not verify_password(user['password'], data['password']):
+                return jsonify({
+                    'success': False,
+                    'message': 'Incorrect email or password'
+                }), 401
 
-        # Generate JWT token
-        token = jwt.encode({
-            'user_id': user['id'],
-            'exp': datetime.now(timezone.utc) + timedelta(seconds=app.config['JWT_EXPIRATION'])
-        }, app.config['SECRET_KEY'], algorithm="HS256")
+            # Check subscription status
+            subscription_expired = is_subscription_expired(user)
 
-        # Update auth_key in the database
-        cursor.execute("UPDATE users SET auth_key = %s WHERE id = %s", (token, user['id']))
-        conn.commit()
+            # Generate JWT token
+            token = issue_token(user['id'], app.config['JWT_EXPIRATION'])
 
-        cursor.close()
-        conn.close()
+            # Update auth_key in the database, rehashing legacy or outdated passwords
+            if not password_needs_rehash(user['password']):
+                cursor.execute("UPDATE users SET auth_key = %s WHERE id = %s", (token, user['id']))
+            else:
+                cursor.execute("UPDATE users SET auth_key = %s, password = %s WHERE id = %s",
+                               (token, hash_password(data['password']), user['id']))
+        finally:
+            cursor.close()
+            conn.close()
 
         return jsonify({
             'success': True,
@@ -760,108 +1405,41 @@ def signup():
             return jsonify({'error': 'Database connection failed'}), 500
 
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (data['email'],))
-        existing_user = cursor.fetchone()
+        try:
+            cursor.execute("SELECT id FROM users WHERE email = %s", (data['email'],))
+            existing_user = cursor.fetchone()
 
-        if existing_user:
-            return jsonify({'error': 'Email already registered'}), 409
+            if existing_user:
+                return jsonify({'error': 'Email already registered'}), 409
 
-        # Set default subscription values
-        default_subscription = 'free'
-        default_expiry = (datetime.now() + timedelta(days=30)).date()  # 30-day trial
+            # Set default subscription values
+            default_subscription = 'free'
+            default_expiry = today() + timedelta(days=30)  # 30-day trial
 
-        # Insert the new user with subscription details
-        cursor.execute(
-            """INSERT INTO users (email, password, name, subscription, subscription_expiry) 
-            VALUES (%s, %s, %s, %s, %s)""",
-            (data['email'], data['password'], data['name'], default_subscription, default_expiry)
-        )
-        conn.commit()
-        new_user_id = cursor.lastrowid
-
-        # Generate JWT token
-        token = jwt.encode({
-            'user_id': new_user_id,
-            'exp': datetime.now(timezone.utc) + timedelta(seconds=app.config['JWT_EXPIRATION'])
-        }, app.config['SECRET_KEY'], algorithm="HS256")
-
-        # Update auth_key for the new user
-        cursor.execute(
-            """UPDATE users 
-            SET auth_key = %s 
-            WHERE id = %s""",
-            (token, new_user_id)
-        )
-        conn.commit()
+            # Insert the new user with subscription details
+            cursor.execute(
+                """INSERT INTO users (email, password, name, subscription, subscription_expiry) 
+                VALUES (%s, %s, %s, %s, %s)""",
+                (data['email'], hash_password(data['password']), data['name'], default_subscription, default_expiry)
+            )
+            new_user_id = cursor.lastrowid
 
-        cursor.close()
-        conn.close()
+            # Generate JWT token
+            token = issue_token(new_user_id, app.config['JWT_EXPIRATION'])
 
-        # Send welcome email to newly registered user
-        try:
-            # Get SMTP settings from environment variables
-            smtp_host = os.getenv('SMTP_HOST')
-            smtp_port = int(os.getenv('SMTP_PORT'))
-            smtp_user = os.getenv('SMTP_USER')
-            smtp_password = os.getenv('SMTP_PASSWORD')
-            smtp_from = os.getenv('SMTP_FROM')
-            
-            # Create email message
-            msg = EmailMessage()
-            
-            # HTML content for welcome email
-            html_content = f"""
-            <html>
-                <head>
-                    <style>
-                        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                        .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                        .header {{ background-color: #4a86e8; color: white; padding: 10px 20px; text-align: center; }}
-                        .content {{ padding: 20px; background-color: #f9f9f9; }}
-                        .footer {{ text-align: center; margin-top: 20px; font-size: 12px; color: #777; }}
-                    </style>
-                </head>
-                <body>
-                    <div class="container">
-                        <div class="header">
-                            <h1>Welcome to Our GEN VIDEO AI</h1>
-                        </div>
-                        <div class="content">
-                            <h2>Hello {data['name']},</h2>
-                            <p>Thank you for signing up with us! We're excited to have you on board.</p>
-                            <p>Your account has been successfully created. Please upgrade to Pro at just ₹10/month and enjoy unlimited video generation.</p>
-                            <ul>
-                            </ul>
-                            <p>If you have any questions or need assistance, feel free to contact our support team.</p>
-                            <p>Best regards,<br>The Team</p>
-                        </div>
-                        <div class="footer">
-                            <p>This is an automated message. Please do not reply to this email.</p>
-                        </div>
-                    </div>
-                </body>
-            </html>
-            """
-            
-            # Set email content with HTML
-            msg.set_content("Thank you for signing up to our platform!")
-            msg.add_alternative(html_content, subtype='html')
-            
-            msg['Subject'] = 'Welcome to Our Platform! GEN VIDEO AI'
-            msg['From'] = smtp_from
-            msg['To'] = data['email']
-
-            # Send the welcome email
-            with smtplib.SMTP(smtp_host, smtp_port) as smtp:
-                smtp.starttls()
-                smtp.login(smtp_user, smtp_password)
-                smtp.send_message(msg)
-                logger.info(f"Welcome email sent to {data['email']}")
-                
-        except Exception as e:
-            # Log the error but don't stop the signup process
-            logger.error(f"Failed to send welcome email: {str(e)}")
-            # Continue with the signup process even if email fails
+            # Update auth_key for the new user
+            cursor.execute(
+                """UPDATE users 
+                SET auth_key = %s 
+                WHERE id = %s""",
+                (token, new_user_id)
+            )
+        finally:
+            cursor.close()
+            conn.close()
+
+        # Send welcome email in the background so signup doesn't wait on SMTP
+        email_executor.submit(send_welcome_email, data['email'], data['name'])
 
         return jsonify({
             'message': 'User created successfully',
@@ -896,15 +1474,16 @@ def update_subscription():
             return jsonify({'error': 'Database connection failed'}), 500
 
         cursor = conn.cursor()
-        cursor.execute(
-            """UPDATE users 
-            SET subscription = %s, subscription_expiry = %s 
-            WHERE id = %s""",
-            (new_subscription, new_expiry, user_id)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        try:
+            cursor.execute(
+                """UPDATE users 
+                SET subscription = %s, subscription_expiry = %s 
+                WHERE id = %s""",
+                (new_subscription, new_expiry, user_id)
+            )
+        finally:
+            cursor.close()
+            conn.close()
 
         return jsonify({
             'message': 'Subscription updated successfully',
@@ -924,58 +1503,23 @@ def forgot_password():
     if not email:
         return jsonify({'error': 'Email is required'}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-    user = cursor.fetchone()
-
-    if not user:
-        cursor.close()
-        conn.close()
-        return jsonify({'message': 'If the email exists, a reset link will be sent'}), 200  # avoid revealing existence
+    with db_cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+        user = cursor.fetchone()
 
-    # Generate token
-    token = jwt.encode(
-        {'user_id': user['id'], 'exp': datetime.now(timezone.utc) + timedelta(hours=RESET_TOKEN_EXPIRY_HOURS)},
-        app.config['SECRET_KEY'],
-        algorithm='HS256'
-    )
+        if not user:
+            return jsonify({'message': 'If the email exists, a reset link will be sent'}), 200  # avoid revealing existence
 
-    # Store token and expiry
-    cursor.execute("UPDATE users SET reset_token = %s, reset_token_expiry = %s WHERE id = %s",
-                   (token, datetime.now() + timedelta(hours=RESET_TOKEN_EXPIRY_HOURS), user['id']))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-    # Get SMTP settings from environment variables
-    smtp_host = os.getenv('SMTP_HOST')
-    smtp_port = int(os.getenv('SMTP_PORT'))
-    smtp_user = os.getenv('SMTP_USER')
-    smtp_password = os.getenv('SMTP_PASSWORD')
-    smtp_from = os.getenv('SMTP_FROM')
-    
-    # Get frontend URL from environment
-    #frontend_url = os.getenv('NEXT_PUBLIC_API_URL', 'http://localhost:3000')
-    frontend_url = os.getenv('NEXT_PUBLIC_API_URL')
-    reset_url = f"{frontend_url}/reset-password?token={token}"
+        # Generate token
+        token = issue_token(user['id'], RESET_TOKEN_EXPIRY_HOURS * 3600)
 
-    # Create email message
-    msg = EmailMessage()
-    msg.set_content(f"Click the link to reset your password: {reset_url}")
-    msg['Subject'] = 'Password Reset Request'
-    msg['From'] = smtp_from
-    msg['To'] = email
+        # Store token and expiry
+        cursor.execute("UPDATE users SET reset_token = %s, reset_token_expiry = %s WHERE id = %s",
+                       (token, datetime.now(timezone.utc) + timedelta(hours=RESET_TOKEN_EXPIRY_HOURS), user['id']))
 
-    try:
-        with smtplib.SMTP(smtp_host, smtp_port) as smtp:
-            smtp.starttls()
-            smtp.login(smtp_user, smtp_password)
-            smtp.send_message(msg)
-            logger.info(f"Password reset email sent to {email}")
-    except Exception as e:
-        logger.error(f"Failed to send email: {str(e)}")
-        return jsonify({'error': f"Failed to send email: {str(e)}"}), 500
+    # Send in the background; delivery failures are logged by send_email
+    reset_url = f"{frontend_url}/reset-password?token={token}"
+    email_executor.submit(send_reset_email, email, reset_url)
 
     return jsonify({'message': 'Password reset link sent'}), 200
 
@@ -989,32 +1533,24 @@ def reset_password():
         return jsonify({'error': 'Token and new password are required'}), 400
 
     try:
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+        # The signature and exp claim are checked locally; the UPDATE only
+        # matches while this is still the user's outstanding reset token
+        payload = decode_token(token)
         user_id = payload['user_id']
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        cursor.execute("SELECT * FROM users WHERE id = %s AND reset_token = %s", (user_id, token))
-        user = cursor.fetchone()
-
-        if not user:
-            cursor.close()
-            conn.close()
-            return jsonify({'error': 'Invalid token'}), 400
-
-        # Check if token is expired
-        if user.get('reset_token_expiry') and user['reset_token_expiry'] < datetime.now():
-            cursor.close()
-            conn.close()
-            return jsonify({'error': 'Token expired'}), 400
-
-        # Store plain password since your login function compares plain passwords
-        cursor.execute("UPDATE users SET password = %s, reset_token = NULL, reset_token_expiry = NULL WHERE id = %s",
-                      (new_password, user_id))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with db_cursor() as cursor:
+            cursor.execute(
+                """UPDATE users SET password = %s, reset_token = NULL, reset_token_expiry = NULL
+                WHERE id = %s AND reset_token = %s
+                AND (reset_token_expiry IS NULL OR reset_token_expiry >= CURRENT_TIMESTAMP)""",
+                (hash_password(new_password), user_id, token)
+            )
+            if cursor.rowcount == 0:
+                # Still the outstanding token, so only reset_token_expiry rejected it
+                cursor.execute("SELECT 1 FROM users WHERE id = %s AND reset_token = %s", (user_id, token))
+                if cursor.fetchone():
+                    return jsonify({'error': 'Token expired'}), 400
+                return jsonify({'error': 'Invalid token'}), 400
 
         return jsonify({'message': 'Password has been reset successfully'}), 200
 
@@ -1039,18 +1575,8 @@ def create_payment(current_user):
         if not all([amount, subscription_type, phone_number]):
             return jsonify({"error": "Missing required fields (amount, subscription_type, phone_number)"}), 400
 
-        # Generate order ID using timestamp
-        timestamp = int(datetime.now().timestamp())
-        unique_id = str(uuid.uuid4())[:8]
-        order_id = f"order_{timestamp}_{unique_id}"
+        order_id = generate_order_id()
         
-        headers = {
-            "Content-Type": "application/json",
-            "x-client-id": CASHFREE_APP_ID,
-            "x-client-secret": CASHFREE_SECRET_KEY,
-            "x-api-version": "2022-09-01"
-        }
-
         order_payload = {
             "order_id": order_id,
             "order_amount": amount,
@@ -1068,12 +1594,12 @@ def create_payment(current_user):
             }
         }
 
-        logger.info(f"Creating order with payload: {json.dumps(order_payload, indent=2)}")
+        logger.debug("Creating order with payload: %s", order_payload)
         
-        order_response = requests.post(
+        order_response = cashfree_session.post(
             f"{CASHFREE_BASE_URL}/orders",
             json=order_payload,
-            headers=headers
+            timeout=CASHFREE_TIMEOUT
         )
         
         if order_response.status_code == 200:
@@ -1082,41 +1608,26 @@ def create_payment(current_user):
             
             if cf_order_id:
                 # Save initial payment record (without phone number)
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO payment_orders (
-                        order_id, user_id, amount, subscription_type, 
-                        duration_days, status, created_at
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    order_id,
-                    current_user['id'],
-                    amount,
-                    subscription_type,
-                    duration_days,
-                    'INITIATED',
-                    datetime.now()
-                ))
-                conn.commit()
-                cursor.close()
-                conn.close()
+                with db_cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO payment_orders (
+                            order_id, user_id, amount, subscription_type, 
+                            duration_days, status, created_at
+                        ) VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    """, (
+                        order_id,
+                        current_user['id'],
+                        amount,
+                        subscription_type,
+                        duration_days,
+                        'INITIATED'
+                    ))
                 
                 # Generate payment link using cf_order_id
                 payment_link = f"https://payments.cashfree.com/order/#/{cf_order_id}" #for deployment
                 
-                # Print order details to terminal
-                print("\nOrder created successfully!")
-                print(f"Order ID: {order_id}")
-                print(f"CF Order ID: {cf_order_id}")
-                print(f"Amount: {amount} INR")
-                print(f"Status: {order_data.get('order_status')}")
-                print(f"Payment Link: {payment_link}")
-                print(f"Expiry: {order_data.get('order_expiry_time')}")
-                
-                # Print full response for debugging
-                print("\nFull Response:")
-                print(json.dumps(order_data, indent=2))
+                logger.info("Created order %s (CF order %s) for %s INR", order_id, cf_order_id, amount)
+                logger.debug("Cashfree order response: %s", order_data)
                 
                 return jsonify({
                     "status": "success",
@@ -1130,23 +1641,22 @@ def create_payment(current_user):
                     "order_details": order_data
                 }), 200
             else:
-                print("\nError: No CF order ID in response")
-                print("Response details:", json.dumps(order_data, indent=2))
+                logger.error("No CF order ID in Cashfree response for order %s", order_id)
+                logger.debug("Cashfree order response: %s", order_data)
                 return jsonify({
                     "error": "No CF order ID in response",
                     "details": order_data
                 }), 400
         else:
-            print("\nError: Failed to create order")
-            print("Response:", order_response.text)
+            logger.error("Failed to create order %s: HTTP %s", order_id, order_response.status_code)
+            logger.debug("Cashfree order response: %s", order_response.text)
             return jsonify({
                 "error": "Failed to create order",
                 "details": order_response.json()
             }), order_response.status_code
 
     except Exception as e:
-        print(f"\nError creating payment: {str(e)}")
-        logger.error(f"Payment creation error: {str(e)}")
+        logger.error("Payment creation error: %s", e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/payment_success')
@@ -1155,15 +1665,9 @@ def payment_success(current_user):
     try:
         order_id = request.args.get('order_id')
         
-        headers = {
-            "x-client-id": CASHFREE_APP_ID,
-            "x-client-secret": CASHFREE_SECRET_KEY,
-            "x-api-version": "2022-09-01"
-        }
-        
-        response = requests.get(
+        response = cashfree_session.get(
             f"{CASHFREE_BASE_URL}/orders/{order_id}",
-            headers=headers
+            timeout=CASHFREE_TIMEOUT
         )
         
         if response.status_code == 200:
@@ -1171,38 +1675,9 @@ def payment_success(current_user):
             is_paid = order_data.get('order_status') == "PAID"
             
             if is_paid:
-                # Get order details from database
-                conn = get_db_connection()
-                cursor = conn.cursor(dictionary=True)
-                cursor.execute("""
-                    SELECT * FROM payment_orders 
-                    WHERE order_id = %s AND user_id = %s
-                """, (order_id, current_user['id']))
-                order_details = cursor.fetchone()
-                
-                if order_details:
-                    # Update subscription
-                    success = update_subscription_status(
-                        current_user['id'],
-                        order_details['subscription_type'],
-                        order_details['duration_days']
-                    )
-                    
-                    if success:
-                        # Save payment record
-                        save_payment_record(order_id, current_user['id'], 
-                                         order_details['amount'], order_data)
-                        
-                        # Update order status
-                        cursor.execute("""
-                            UPDATE payment_orders 
-                            SET status = %s, updated_at = %s 
-                            WHERE order_id = %s
-                        """, ('COMPLETED', datetime.now(), order_id))
-                        conn.commit()
-                
-                cursor.close()
-                conn.close()
+                # No-op if the webhook already completed this order
+                with db_cursor(transaction=True) as cursor:
+                    complete_order(cursor, order_id, order_data, current_user['id'])
             
             return jsonify({
                 "status": "success",
@@ -1225,50 +1700,71 @@ def payment_success(current_user):
 @token_required  # Allow checking subscription even if expired
 def check_subscription(current_user):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
+        # Fresh subscription fields and the latest order in one round trip
+        with db_cursor(dictionary=True) as cursor:
+            cursor.execute("""
+                SELECT u.subscription, u.subscription_expiry,
+                       po.order_id, po.status, po.created_at
+                FROM users u
+                LEFT JOIN payment_orders po ON po.order_id = (
+                    SELECT order_id FROM payment_orders
+                    WHERE user_id = u.id
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                )
+                WHERE u.id = %s
+            """, (current_user['id'],))
+            row = cursor.fetchone() or current_user
+
         # Calculate if subscription is expired
         subscription_expired = False
         is_active = False
         
-        if current_user['subscription_expiry']:
-            expiry_date = datetime.strptime(str(current_user['subscription_expiry']), '%Y-%m-%d').date()
-            subscription_expired = expiry_date < datetime.now().date()
-            is_active = not subscription_expired and current_user['subscription'] != 'free'
-        
-        # Get latest payment status if any
-        cursor.execute("""
-            SELECT order_id, status, created_at 
-            FROM payment_orders 
-            WHERE user_id = %s 
-            ORDER BY created_at DESC 
-            LIMIT 1
-        """, (current_user['id'],))
-        
-        latest_payment = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        if row['subscription_expiry']:
+            subscription_expired = is_subscription_expired(row)
+            is_active = not subscription_expired and row['subscription'] != 'free'
         
         return jsonify({
             "isPro": is_active,
             "subscription": {
-                "type": current_user["subscription"],
-                "expiryDate": str(current_user["subscription_expiry"]) if current_user["subscription_expiry"] else None,
+                "type": row["subscription"],
+                "expiryDate": str(row["subscription_expiry"]) if row["subscription_expiry"] else None,
                 "isExpired": subscription_expired
             },
             "latestPayment": {
-                "orderId": latest_payment["order_id"] if latest_payment else None,
-                "status": latest_payment["status"] if latest_payment else None,
-                "date": latest_payment["created_at"].isoformat() if latest_payment else None
-            } if latest_payment else None
+                "orderId": row["order_id"],
+                "status": row["status"],
+                "date": row["created_at"].isoformat()
+            } if row.get("order_id") else None
         }), 200
         
     except Exception as e:
         app.logger.error(f"Error checking subscription: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Tokens issued by /session in the last minute, by user id, so a burst of
+# polls for the same expired session writes auth_key only once. Refreshes are
+# serialised per user through a striped lock; _session_refresh_cache_lock only
+# guards the cache itself and is never held across the DB write.
+_session_refresh_cache = TTLCache(maxsize=10000, ttl=60)
+_session_refresh_cache_lock = threading.Lock()
+_session_refresh_locks = [threading.Lock() for _ in range(64)]
+
+def refresh_session_token(user_id):
+    """Issue and store a new auth_key for user_id, reusing one issued moments ago"""
+    with _session_refresh_locks[user_id % len(_session_refresh_locks)]:
+        with _session_refresh_cache_lock:
+            token = _session_refresh_cache.get(user_id)
+        if token:
+            return token
+        token = issue_token(user_id, app.config['JWT_EXPIRATION'])
+        with db_cursor() as cursor:
+            cursor.execute("UPDATE users SET auth_key = %s WHERE id = %s", (token, user_id))
+        with _session_refresh_cache_lock:
+            _session_refresh_cache[user_id] = token
+    logger.info("Generated new token for user %s as previous token had just expired", user_id)
+    return token
+
 @app.route('/session', methods=['GET', 'POST'])
 def get_session():
     try:
@@ -1285,75 +1781,37 @@ def get_session():
                 return jsonify({'user': None, 'error': 'Email is required in query params or X-User-Email header'}), 400
         
         # Get user from database by email
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        with db_cursor(dictionary=True) as cursor:
+            cursor.execute(f"SELECT {USER_COLUMNS}, auth_key FROM users WHERE email = %s", (email,))
+            user = cursor.fetchone()
         
         if not user:
-            cursor.close()
-            conn.close()
             return jsonify({'user': None, 'error': 'User not found'}), 404
         
         # Check subscription status
-        subscription_expired = False
-        if user['subscription_expiry']:
-            subscription_expired = datetime.strptime(str(user['subscription_expiry']), '%Y-%m-%d').date() < datetime.now().date()
+        subscription_expired = is_subscription_expired(user)
         
         # Check if token exists and is valid
         current_token = user.get('auth_key')
-        token_is_valid = False
         
         # If user doesn't have an auth_key (logged out), return user: null but with 200 OK
         if not current_token:
-            cursor.close()
-            conn.close()
             return jsonify({'user': None, 'logged_in': False}), 200
         
-        if current_token:
-            try:
-                # Try to decode the token to check if it's valid
-                decoded_token = jwt.decode(current_token, app.config['SECRET_KEY'], algorithms=["HS256"])
-                # Check if token is expired
-                exp_timestamp = decoded_token.get('exp')
-                if exp_timestamp:
-                    # Convert to datetime
-                    exp_datetime = datetime.fromtimestamp(exp_timestamp, tz=timezone.utc)
-                    # Check if token is still valid
-                    if exp_datetime > datetime.now(timezone.utc):
-                        token_is_valid = True
-            except jwt.ExpiredSignatureError:
-                # Token has expired
-                pass
-            except jwt.InvalidTokenError:
-                # Token is invalid
-                pass
-        
-        # Generate a new token only if the current one is invalid or expired
-        if not token_is_valid:
-            # If the token is invalid but exists, refresh it
-            if current_token:
-                # Generate new JWT token
-                new_token = jwt.encode({
-                    'user_id': user['id'],
-                    'exp': datetime.now(timezone.utc) + timedelta(seconds=app.config['JWT_EXPIRATION'])
-                }, app.config['SECRET_KEY'], algorithm="HS256")
-                
-                # Update auth_key in the database
-                cursor.execute("UPDATE users SET auth_key = %s WHERE id = %s", (new_token, user['id']))
-                conn.commit()
-                
-                # Use the new token
-                current_token = new_token
-                logger.info(f"Generated new token for user {user['id']} as previous token was expired or invalid")
-            else:
-                # User has no token (logged out) - return success with null user
-                cursor.close()
-                conn.close()
+        try:
+            # decode_token rejects expired tokens and skips the HMAC for recently seen ones
+            decode_token(current_token)
+        except jwt.ExpiredSignatureError:
+            # Only renew a genuine token that expired moments ago; anything
+            # older means signing in again
+            expired_at = jwt.decode(
+                current_token, _JWT_KEY, algorithms=['HS256'], options={'verify_exp': False}
+            ).get('exp', 0)
+            if time.time() - expired_at > SESSION_REFRESH_GRACE:
                 return jsonify({'user': None, 'logged_in': False}), 200
-        
-        cursor.close()
-        conn.close()
+            current_token = refresh_session_token(user['id'])
+        except jwt.InvalidTokenError:
+            return jsonify({'user': None, 'logged_in': False}), 200
         
         # Return user data (excluding sensitive information) along with the token
         return jsonify({
@@ -1375,11 +1833,9 @@ def get_session():
     
 @app.route('/payment_webhook', methods=['POST'])
 def payment_webhook():
-    conn = None
-    cursor = None
     try:
         webhook_data = request.json
-        app.logger.info(f"Received webhook data: {json.dumps(webhook_data, indent=2)}")
+        app.logger.debug("Received webhook data: %s", webhook_data)
         
         if not webhook_data or 'data' not in webhook_data:
             app.logger.error("Invalid webhook data received")
@@ -1394,97 +1850,41 @@ def payment_webhook():
             return jsonify({"error": "Missing order_id"}), 400
 
         # Get payment details from Cashfree API
-        headers = {
-            "x-client-id": CASHFREE_APP_ID,
-            "x-client-secret": CASHFREE_SECRET_KEY,
-            "x-api-version": "2022-09-01"
-        }
-        
-        response = requests.get(
+        response = cashfree_session.get(
             f"{CASHFREE_BASE_URL}/orders/{order_id}",
-            headers=headers
+            timeout=CASHFREE_TIMEOUT
         )
         
         if response.status_code != 200:
-            app.logger.error(f"Failed to fetch order details from Cashfree: {response.text}")
+            app.logger.error("Failed to fetch order details from Cashfree: %s", response.text)
             return jsonify({"error": "Failed to verify order status"}), 400
 
         payment_details = response.json()
         is_paid = payment_details.get('order_status') == "PAID"
 
-        app.logger.info(f"Order {order_id} payment status: {payment_details.get('order_status')}")
+        app.logger.info("Order %s payment status: %s", order_id, payment_details.get('order_status'))
 
         if is_paid:
-            # Create a new connection for this request
-            conn = mysql.connector.connect(**DATABASE_CONFIG)
-            cursor = conn.cursor(dictionary=True)
-            
-            # Check if payment was already processed
-            cursor.execute("""
-                SELECT status FROM payment_orders 
-                WHERE order_id = %s FOR UPDATE
-            """, (order_id,))
-            existing_order = cursor.fetchone()
-            
-            if existing_order and existing_order['status'] == 'COMPLETED':
-                app.logger.info(f"Payment for order {order_id} was already processed")
-                return jsonify({
-                    "status": "success",
-                    "message": "Payment already processed"
-                }), 200
-
-            # Get order details
-            cursor.execute("""
-                SELECT * FROM payment_orders 
-                WHERE order_id = %s
-            """, (order_id,))
-            order_details = cursor.fetchone()
-            
-            if not order_details:
-                app.logger.error(f"Order details not found for order_id: {order_id}")
-                return jsonify({"error": "Order not found"}), 404
-
             try:
-                # Update subscription
-                cursor.execute("""
-                    UPDATE users 
-                    SET subscription = %s,
-                        subscription_expiry = %s 
-                    WHERE id = %s
-                """, (
-                    order_details['subscription_type'],
-                    (datetime.now() + timedelta(days=order_details['duration_days'])).date(),
-                    order_details['user_id']
-                ))
-
-                # Save payment record
-                cursor.execute("""
-                    INSERT INTO payments (
-                        order_id, user_id, amount, payment_status,
-                        payment_method, transaction_id, payment_date
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    order_id,
-                    order_details['user_id'],
-                    order_details['amount'],
-                    payment_details.get('order_status'),
-                    payment_details.get('payment_method', 'unknown'),
-                    payment_details.get('cf_payment_id', ''),
-                    datetime.now()
-                ))
-
-                # Update order status
-                cursor.execute("""
-                    UPDATE payment_orders 
-                    SET status = %s,
-                        updated_at = %s,
-                        payment_response = %s
-                    WHERE order_id = %s
-                """, ('COMPLETED', datetime.now(), json.dumps(payment_details), order_id))
-                
-                # Commit all changes
-                conn.commit()
-                app.logger.info(f"Successfully processed payment for order {order_id}")
+                with db_cursor(dictionary=True, transaction=True) as cursor:
+                    # Cashfree retries webhooks; only the first delivery claims the order.
+                    # A concurrent retry waits on this key and then sees it taken.
+                    cursor.execute("INSERT IGNORE INTO webhook_dedup (order_id) VALUES (%s)", (order_id,))
+                    claimed = cursor.rowcount == 1
+
+                    if not (claimed and complete_order(cursor, order_id, payment_details)):
+                        cursor.execute("SELECT 1 FROM payment_orders WHERE order_id = %s", (order_id,))
+                        if not cursor.fetchone():
+                            # Raising rolls back the dedup key so a later retry can still apply it
+                            raise LookupError(order_id)
+                        app.logger.info("Payment for order %s was already processed", order_id)
+                        return jsonify({
+                            "status": "success",
+                            "message": "Payment already processed"
+                        }), 200
+
+                # Changes are committed when the cursor block exits cleanly
+                app.logger.info("Successfully processed payment for order %s", order_id)
                 
                 return jsonify({
                     "status": "success",
@@ -1493,14 +1893,15 @@ def payment_webhook():
                     "payment_details": payment_details
                 }), 200
 
+            except LookupError:
+                app.logger.error("Order details not found for order_id: %s", order_id)
+                return jsonify({"error": "Order not found"}), 404
             except Exception as e:
-                if conn:
-                    conn.rollback()
-                app.logger.error(f"Error in database operations: {str(e)}")
+                app.logger.error("Error in database operations: %s", e)
                 return jsonify({"error": f"Database operation error: {str(e)}"}), 500
 
         else:
-            app.logger.info(f"Payment not successful for order {order_id}. Status: {payment_details.get('order_status')}")
+            app.logger.info("Payment not successful for order %s. Status: %s", order_id, payment_details.get('order_status'))
             return jsonify({
                 "status": "pending",
                 "message": f"Payment not successful for order {order_id}",
@@ -1508,16 +1909,8 @@ def payment_webhook():
             }), 200
 
     except Exception as e:
-        if conn and conn.is_connected():
-            conn.rollback()
-        app.logger.error(f"Webhook processing error: {str(e)}")
+        app.logger.error("Webhook processing error: %s", e)
         return jsonify({"error": str(e)}), 500
-        
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 # Fixed logout endpoint - should work even with expired subscription
 @app.route('/logout', methods=['POST'])
@@ -1532,13 +1925,13 @@ def logout(current_user):
             }), 500
 
         cursor = conn.cursor()
-        
-        # Set auth_key to NULL to invalidate the token
-        cursor.execute("UPDATE users SET auth_key = NULL WHERE id = %s", (current_user['id'],))
-        conn.commit()
-        
-        cursor.close()
-        conn.close()
+        try:
+            # Set auth_key to NULL to invalidate the token
+            cursor.execute("UPDATE users SET auth_key = NULL WHERE id = %s", (current_user['id'],))
+        finally:
+            cursor.close()
+            conn.close()
+        forget_token(get_bearer_token())
 
         response = jsonify({
             'success': True,
@@ -1554,14 +1947,6 @@ def logout(current_user):
             'message': 'Internal server error'
         }), 500
 
-# CORS configuration
-@app.after_request
-def after_request(response):
-    response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,POST,DELETE,OPTIONS')
-    return response
-
 if __name__ == '__main__':
     #import os
     # In production, debug should be False
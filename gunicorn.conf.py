@@ -0,0 +1,36 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app`
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# Most routes wait on MySQL, SMTP or Cashfree, so each worker serves several
+# requests at once on threads. app.py sizes each worker's DB pool from
+# GUNICORN_THREADS unless DB_POOL_SIZE is set; keep threads <= DB_POOL_SIZE.
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# GEVENT=1 serves requests on greenlets instead; app.py then patches the
+# stdlib and switches mysql-connector to its pure-Python driver. Requests
+# beyond DB_POOL_SIZE wait for a pooled connection. Set it in the real
+# environment: neither this file nor app.py's gevent check reads .env.
+if os.getenv('GEVENT') == '1':
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GEVENT_WORKER_CONNECTIONS', 1000))
+
+# generate_video only waits for its uploads; rendering runs in the background
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+
+
+def on_starting(server):
+    # Every worker opens its whole DB pool at startup; past the server's
+    # max_connections (MySQL defaults to 151) the later workers can't connect
+    pool_size = int(os.getenv('DB_POOL_SIZE', threads + int(os.getenv('RENDER_WORKERS', 2)) + 1))
+    max_connections = int(os.getenv('DB_MAX_CONNECTIONS', 151))
+    if workers * pool_size > max_connections:
+        server.log.warning(
+            "%d workers x DB_POOL_SIZE %d = %d MySQL connections, over DB_MAX_CONNECTIONS %d; "
+            "lower WEB_CONCURRENCY or DB_POOL_SIZE", workers, pool_size, workers * pool_size, max_connections
+        )
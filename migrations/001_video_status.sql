@@ -0,0 +1,5 @@
+-- Track background render progress for each video.
+-- Values: 'pending' (queued or rendering), 'ready', 'failed'.
+-- Existing rows were rendered synchronously, so they default to 'ready'.
+ALTER TABLE videos
+    ADD COLUMN status VARCHAR(16) NOT NULL DEFAULT 'ready';
@@ -0,0 +1,13 @@
+-- Indexes for the hot video and user lookups.
+-- Remove any duplicate filenames / emails before applying; the unique
+-- indexes will fail to build otherwise.
+
+-- get_videos (ORDER BY created_at DESC, filename DESC), get_user_video_count,
+-- clear_cache and the per-user checks in delete_video
+CREATE INDEX idx_videos_user_created ON videos (user_id, created_at DESC, filename DESC);
+
+-- serve_video, video_status and delete_video look videos up by filename
+CREATE UNIQUE INDEX idx_videos_filename ON videos (filename);
+
+-- signin, signup, forgot-password and session look users up by email
+CREATE UNIQUE INDEX idx_users_email ON users (email);
@@ -0,0 +1,9 @@
+-- Indexes for the payment order lookups.
+-- Skip idx_payment_orders_order_id if order_id is already the primary key.
+-- users.email is covered by 002; auth_key is never used in a WHERE clause.
+
+-- payment_success and payment_webhook look orders up by order_id
+CREATE UNIQUE INDEX idx_payment_orders_order_id ON payment_orders (order_id);
+
+-- check_subscription reads the latest order (ORDER BY created_at DESC LIMIT 1)
+CREATE INDEX idx_payment_orders_user_created ON payment_orders (user_id, created_at DESC);
@@ -0,0 +1,7 @@
+-- One row per order whose payment webhook has been claimed.
+-- payment_webhook inserts here with INSERT IGNORE so Cashfree retries of the
+-- same order are detected without locking the payment_orders row.
+CREATE TABLE webhook_dedup (
+    order_id VARCHAR(64) NOT NULL PRIMARY KEY,
+    processed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,10 @@
+-- Liveness of background renders.
+-- Each web process refreshes render_heartbeat_at every minute for the videos
+-- it has queued or rendering. Pending rows whose heartbeat (or created_at,
+-- before the first heartbeat) is older than RENDER_STALE_AFTER were lost with
+-- their process and are marked 'failed'.
+ALTER TABLE videos
+    ADD COLUMN render_heartbeat_at DATETIME NULL;
+
+-- The stale-render sweep only looks at pending rows
+CREATE INDEX idx_videos_status ON videos (status);
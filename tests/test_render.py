@@ -0,0 +1,102 @@
+import shutil
+import subprocess
+
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None,
+    reason="ffmpeg is not installed"
+)
+
+
+def make_media(path, lavfi_source, *args):
+    subprocess.run(
+        ['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-f', 'lavfi', '-i', lavfi_source, *args, str(path)],
+        check=True
+    )
+
+
+@pytest.mark.parametrize('transition_type', ['fade', 'none'])
+def test_render_video_with_gif_input(tmp_path, transition_type):
+    import app
+
+    gif = tmp_path / 'animated.gif'
+    png = tmp_path / 'still.png'
+    voice = tmp_path / 'voice.wav'
+    background = tmp_path / 'background.wav'
+    make_media(gif, 'testsrc=size=320x240:rate=10:duration=1')
+    make_media(png, 'color=red:size=640x480', '-frames:v', '1')
+    make_media(voice, 'sine=frequency=440:duration=3')
+    make_media(background, 'sine=frequency=220:duration=1')
+
+    output = tmp_path / 'out.mp4'
+    app.render_video(
+        image_paths=[str(gif), str(png)],
+        text_overlays=[],
+        voice_path=str(voice),
+        background_path=str(background),
+        output_path=str(output),
+        work_folder=str(tmp_path),
+        voice_duration=3.0,
+        min_time=1,
+        max_time=2,
+        transition_type=transition_type,
+        transition_time=0.5,
+        voice_volume=1.0,
+        background_volume=0.3
+    )
+
+    assert app.probe_duration(str(output)) == pytest.approx(3.0, abs=0.2)
+
+
+@pytest.mark.parametrize('name', ['a:b.png', 'c\\d.png', "e'f.png", 'g,h;[i].png', "C:\\x'y:%.png"])
+def test_escape_filter_value_survives_both_parsing_levels(tmp_path, name):
+    import app
+
+    path = tmp_path / name
+    make_media(path, 'color=red:size=16x16', '-frames:v', '1')
+
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error',
+         '-filter_complex', f"movie={app.escape_filter_value(str(path))}[v]",
+         '-map', '[v]', '-frames:v', '1', '-f', 'null', '-'],
+        capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def has_drawtext():
+    filters = subprocess.run(['ffmpeg', '-hide_banner', '-filters'], capture_output=True, text=True).stdout
+    return ' drawtext ' in filters
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None or not has_drawtext(), reason="ffmpeg has no drawtext")
+def test_render_video_caption_with_expansion_characters(tmp_path):
+    import app
+
+    png = tmp_path / 'still.png'
+    voice = tmp_path / 'voice.wav'
+    make_media(png, 'color=red:size=640x480', '-frames:v', '1')
+    background = tmp_path / 'background.wav'
+    make_media(voice, 'sine=frequency=440:duration=2')
+    make_media(background, 'sine=frequency=220:duration=1')
+
+    output = tmp_path / 'out.mp4'
+    app.render_video(
+        image_paths=[str(png)],
+        text_overlays=['50% off \\ 100%{pts}'],
+        voice_path=str(voice),
+        background_path=str(background),
+        output_path=str(output),
+        work_folder=str(tmp_path),
+        voice_duration=2.0,
+        min_time=2,
+        max_time=2,
+        transition_type='none',
+        transition_time=0.5,
+        voice_volume=1.0,
+        background_volume=0.3
+    )
+
+    assert app.probe_duration(str(output)) == pytest.approx(2.0, abs=0.2)